@@ -5,22 +5,95 @@ Provides read-only access to RT tickets and text attachments.
 """
 
 import os
+import re
 import sys
 import argparse
-import base64
-from typing import Optional, Dict, Any
+import asyncio
+import binascii
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List, Tuple
+from urllib.parse import quote
 
 import httpx
+import orjson
 from fastmcp import FastMCP, Context
+from fastmcp.tools import ToolResult
 
 # Global configuration (will be set from command-line args or environment)
 RT_BASE_URL: str = ""
 RT_TOKEN: str = ""
 
+# Request settings derived from the configuration once by configure()
+_BASE_URL: str = ""
+_HEADERS: Dict[str, str] = {}
+
+# Maximum number of concurrent requests a single tool call sends to RT
+MAX_CONCURRENT_REQUESTS = 8
+
+# Maximum number of tickets fetched with one TicketSQL query (RT's per_page limit)
+TICKET_BATCH_SIZE = 100
+
+# One "Name: value" header per line; folded continuation lines start with
+# whitespace and are not matched
+_HEADER_RE = re.compile(r"^([^\s:]+):[ \t]*(.*?)[ \t\r]*$", re.MULTILINE)
+
+# Shared HTTP client (created lazily on first request, closed on shutdown)
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_rt_client() -> httpx.AsyncClient:
+    """
+    Get the shared HTTP client for RT API requests.
+
+    The client is created on first use and keeps connections alive between
+    requests, so sequential calls avoid a new TCP/TLS handshake each time.
+    HTTP/2 is negotiated when the RT server supports it (falls back to HTTP/1.1).
+
+    Returns:
+        Pooled httpx.AsyncClient configured with RT base URL and auth headers
+    """
+    global _client
+
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=_BASE_URL,
+            headers=_HEADERS,
+            timeout=30.0,
+            # HTTP/2 multiplexes concurrent requests over a few connections
+            http2=True,
+            limits=httpx.Limits(
+                max_keepalive_connections=4,
+                max_connections=40,
+                keepalive_expiry=60
+            )
+        )
+    return _client
+
+
+async def close_rt_client() -> None:
+    """Close the shared HTTP client if it was created."""
+    global _client
+
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    """Server lifespan: release pooled connections on shutdown."""
+    try:
+        yield
+    finally:
+        await close_rt_client()
+
+
 # Initialize FastMCP server
 mcp = FastMCP(
     name="RT REST2 MCP Server",
-    instructions="Provides read-only access to RT (Request Tracker) tickets, correspondence, and hierarchy via REST2 API"
+    instructions="Provides read-only access to RT (Request Tracker) tickets, correspondence, and hierarchy via REST2 API",
+    lifespan=lifespan
 )
 
 
@@ -41,19 +114,81 @@ async def make_rt_request(
     Raises:
         httpx.HTTPStatusError: If the request fails
     """
-    url = f"{RT_BASE_URL.rstrip('/')}{endpoint}"
-    headers = {
-        "Authorization": f"token {RT_TOKEN}",
-        "Accept": "application/json"
-    }
-
     if ctx:
         await ctx.info(f"Making request to: {endpoint}")
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers, timeout=30.0)
-        response.raise_for_status()
-        return response.json()
+    response = await get_rt_client().get(endpoint)
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+
+# Human-readable size units, indexed by floor(log1024(size))
+_SIZE_UNITS = (("bytes", 1), ("KB", 1024), ("MB", 1024 ** 2), ("GB", 1024 ** 3))
+
+
+def _format_size(size: int) -> str:
+    """
+    Format a size in bytes as a human-readable string (bytes, KB, MB, GB).
+
+    Args:
+        size: Size in bytes
+
+    Returns:
+        Formatted size (e.g., "512 bytes", "1.5 MB")
+    """
+    # Each unit step is 10 bits, so the unit follows from the bit length
+    index = min(max(0, (size.bit_length() - 1) // 10), len(_SIZE_UNITS) - 1)
+    if index == 0:
+        return f"{size} bytes"
+    unit, divisor = _SIZE_UNITS[index]
+    return f"{size / divisor:.1f} {unit}"
+
+
+# Output schema FastMCP derives for tools annotated "-> dict"; tools returning
+# a ToolResult declare it explicitly to keep the same contract
+JSON_OBJECT_SCHEMA = {"type": "object", "additionalProperties": True}
+
+
+def _json_result(data: Dict[str, Any]) -> ToolResult:
+    """
+    Wrap a tool result dictionary, serializing its text content with orjson.
+
+    Used by tools returning large payloads (base64 content, long
+    correspondence) instead of FastMCP's default JSON serializer.
+
+    Args:
+        data: Tool result dictionary
+
+    Returns:
+        ToolResult with JSON text content and the dictionary as structured content
+    """
+    return ToolResult(
+        content=orjson.dumps(data).decode(),
+        structured_content=data
+    )
+
+
+def _ref_id(value: Any) -> Any:
+    """
+    Get the identifier of an RT object reference.
+
+    RT returns references (Queue, Owner, Creator, TransactionId, ...) either
+    as objects like {"id": ..., "type": ..., "_url": ...} or as plain values.
+
+    Args:
+        value: Reference object or plain value
+
+    Returns:
+        The reference's id (or Name if it has no id), or the value itself
+    """
+    # Exact class check is cheaper than isinstance and RT JSON only yields dicts
+    if value.__class__ is dict:
+        return value.get("id") or value.get("Name")
+    return value
+
+
+# Hyperlink ref -> relationships bucket
+_RELATIONSHIP_BUCKETS = {"parent": "parents", "child": "children"}
 
 
 def extract_ticket_relationships(ticket_data: Dict[str, Any]) -> Dict[str, list]:
@@ -64,23 +199,149 @@ def extract_ticket_relationships(ticket_data: Dict[str, Any]) -> Dict[str, list]
         ticket_data: Raw ticket data from RT API
 
     Returns:
-        Dictionary with 'parents' and 'children' lists containing ticket IDs
+        Dictionary with 'parents' and 'children' lists containing integer ticket IDs
     """
     relationships = {"parents": [], "children": []}
 
-    hyperlinks = ticket_data.get("_hyperlinks", [])
-    for link in hyperlinks:
-        ref = link.get("ref")
+    for link in ticket_data.get("_hyperlinks", ()):
+        bucket = _RELATIONSHIP_BUCKETS.get(link.get("ref"))
+        if bucket is None:
+            continue
+
         ticket_id = link.get("id")
+        if not ticket_id:
+            continue
 
-        if ref == "parent" and ticket_id:
-            relationships["parents"].append(str(ticket_id))
-        elif ref == "child" and ticket_id:
-            relationships["children"].append(str(ticket_id))
+        # Skip links whose id is not a ticket number (they cannot be fetched)
+        if type(ticket_id) is int:
+            relationships[bucket].append(ticket_id)
+        elif str(ticket_id).isdigit():
+            relationships[bucket].append(int(ticket_id))
 
     return relationships
 
 
+def _parse_headers(headers_str: str) -> Dict[str, str]:
+    """
+    Parse an attachment's MIME Headers block into a dictionary.
+
+    Args:
+        headers_str: Raw Headers string from RT attachment data
+
+    Returns:
+        Dictionary mapping lowercase header names to values (first occurrence wins)
+    """
+    headers = {}
+    for name, value in _HEADER_RE.findall(headers_str):
+        headers.setdefault(name.lower(), value)
+    return headers
+
+
+def classify_attachment(
+    attachment_data: Dict[str, Any],
+    headers: Optional[Dict[str, str]] = None
+) -> Tuple[str, bool]:
+    """
+    Determine the effective content type of an attachment and whether it is
+    user-typed inline text (text type without a filename).
+
+    Works on full attachment data as well as on metadata-only list entries.
+
+    Args:
+        attachment_data: Attachment data from RT API
+        headers: Parsed Headers block (parsed from attachment_data if omitted)
+
+    Returns:
+        Tuple of (content type, is inline text)
+    """
+    content_type = attachment_data.get("ContentType", "")
+    subject = attachment_data.get("Subject", "").strip()
+
+    # Check if it's a text type
+    is_text = content_type.startswith("text/")
+    if not is_text and content_type == "application/octet-stream":
+        # Check for X-RT-Original-Content-Type
+        if headers is None:
+            headers = _parse_headers(attachment_data.get("Headers") or "")
+        original_type = headers.get("x-rt-original-content-type", "")
+        if original_type.startswith("text/"):
+            is_text = True
+            content_type = original_type
+
+    return content_type, is_text and not subject
+
+
+def attachment_size(
+    attachment_data: Dict[str, Any],
+    headers: Optional[Dict[str, str]] = None
+) -> Optional[int]:
+    """
+    Get the decoded size of an attachment in bytes without decoding it.
+
+    Uses the Content-Length header when RT recorded one, otherwise derives the
+    size from the length of the base64-encoded Content.
+
+    Args:
+        attachment_data: Attachment data from RT API
+        headers: Parsed Headers block (parsed from attachment_data if omitted)
+
+    Returns:
+        Size in bytes, or None if neither header nor Content is available
+    """
+    if headers is None:
+        headers = _parse_headers(attachment_data.get("Headers") or "")
+    content_length = headers.get("content-length", "")
+    if content_length.isdigit():
+        return int(content_length)
+
+    encoded_content = attachment_data.get("Content")
+    if encoded_content is None:
+        return None
+
+    # MIME-style base64 wraps lines; only non-whitespace, non-padding
+    # characters carry data (4 characters per 3 bytes)
+    stripped = encoded_content.rstrip()
+    padding = len(stripped) - len(stripped.rstrip("="))
+    data_chars = (
+        len(stripped) - stripped.count("\n") - stripped.count("\r") - padding
+    )
+    return data_chars * 3 // 4
+
+
+def attachment_needs_content(
+    attachment_info: Dict[str, Any]
+) -> Tuple[bool, Optional[Dict[str, str]]]:
+    """
+    Decide whether an attachment list entry must be fetched in full.
+
+    The metadata-only list entry is enough for file attachments of known size,
+    multipart containers and entries without a transaction. Only inline text
+    (whose Content becomes the message), files without a Content-Length header
+    and entries lacking the requested metadata need /attachment/{id}.
+
+    Args:
+        attachment_info: Attachment entry from the ticket attachments list
+
+    Returns:
+        Tuple of (True if the full attachment including Content has to be
+        fetched, parsed Headers block of the entry or None if not parsed)
+    """
+    # RT did not return the requested fields; classify from the full data
+    if "ContentType" not in attachment_info or "TransactionId" not in attachment_info:
+        return True, None
+
+    # Entries without a transaction are skipped when grouping
+    if not _ref_id(attachment_info["TransactionId"]):
+        return False, None
+
+    headers = _parse_headers(attachment_info.get("Headers") or "")
+    content_type, is_inline_text = classify_attachment(attachment_info, headers)
+    if content_type == "multipart/mixed":
+        return False, headers
+
+    return is_inline_text or attachment_size(attachment_info, headers) is None, headers
+
+
 @mcp.tool
 async def get_ticket(ticket_id: int, ctx: Context) -> dict:
     """
@@ -142,11 +403,11 @@ async def get_ticket(ticket_id: int, ctx: Context) -> dict:
         return {"error": error_msg, "ticket_id": ticket_id}
 
 
-@mcp.tool
+@mcp.tool(output_schema=JSON_OBJECT_SCHEMA)
 async def get_ticket_correspondence(
     ticket_id: int,
     ctx: Context
-) -> dict:
+) -> ToolResult:
     """
     Get ticket correspondence (comments and replies with attachments).
 
@@ -173,63 +434,82 @@ async def get_ticket_correspondence(
     try:
         await ctx.info(f"Fetching correspondence for ticket {ticket_id}")
 
-        # Get list of attachments
+        # Get list of attachments with metadata only (no base64 Content)
+        fields = "Subject,ContentType,TransactionId,Creator,Created,Headers"
         attachments_data = await make_rt_request(
-            f"/ticket/{ticket_id}/attachments",
+            f"/ticket/{ticket_id}/attachments?fields={fields}",
             ctx
         )
 
         if not isinstance(attachments_data, dict):
-            return {
+            return _json_result({
                 "error": "Unexpected response format",
                 "ticket_id": ticket_id,
                 "data": attachments_data
-            }
+            })
 
         items = attachments_data.get("items", [])
         total_attachments = len(items)
 
         await ctx.info(f"Found {total_attachments} total attachments")
 
-        # Fetch all attachments and group by transaction
-        transactions_map = {}  # transaction_id -> list of attachments
-
-        for idx, attachment_info in enumerate(items, 1):
-            attachment_id = attachment_info.get("id")
-            await ctx.report_progress(idx, total_attachments)
-
-            # Fetch full attachment data
-            attachment_data = await make_rt_request(
-                f"/attachment/{attachment_id}",
-                ctx
-            )
-
+        # Fetch attachment content concurrently (bounded to respect RT server limits)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        completed = 0
+
+        async def fetch_attachment(
+            attachment_info: Dict[str, Any]
+        ) -> Tuple[Dict[str, Any], Optional[Dict[str, str]]]:
+            """Fetch full attachment data if its content is needed and report progress."""
+            nonlocal completed
+            needs_content, headers = attachment_needs_content(attachment_info)
+            if not needs_content:
+                attachment_data = attachment_info
+            else:
+                async with semaphore:
+                    attachment_data = await make_rt_request(
+                        f"/attachment/{attachment_info.get('id')}",
+                        ctx
+                    )
+                # Headers of the full data are parsed when processing it
+                headers = None
+            completed += 1
+            await ctx.report_progress(completed, total_attachments)
+            return attachment_data, headers
+
+        tasks = [
+            asyncio.ensure_future(fetch_attachment(attachment_info))
+            for attachment_info in items
+        ]
+        try:
+            attachments = await asyncio.gather(*tasks)
+        except BaseException:
+            # gather does not cancel the remaining fetches when one fails
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        # Group attachments by transaction
+        transactions_map = defaultdict(
+            lambda: {"attachments": [], "creator": None, "created": None}
+        )  # transaction_id -> list of attachments
+
+        for attachment_data, headers in attachments:
             # Extract transaction ID
-            transaction_id_obj = attachment_data.get("TransactionId")
-            if not transaction_id_obj:
-                continue
-
-            transaction_id = transaction_id_obj.get("id") if isinstance(transaction_id_obj, dict) else transaction_id_obj
+            transaction_id = _ref_id(attachment_data.get("TransactionId"))
             if not transaction_id:
                 continue
 
-            # Initialize transaction entry if needed
-            if transaction_id not in transactions_map:
-                transactions_map[transaction_id] = {
-                    "attachments": [],
-                    "creator": None,
-                    "created": None
-                }
+            transaction = transactions_map[transaction_id]
 
             # Extract creator and created (same for all attachments in transaction)
-            if not transactions_map[transaction_id]["creator"]:
-                creator_obj = attachment_data.get("Creator")
-                if creator_obj:
-                    transactions_map[transaction_id]["creator"] = creator_obj.get("id") if isinstance(creator_obj, dict) else creator_obj
-                transactions_map[transaction_id]["created"] = attachment_data.get("Created")
+            if not transaction["creator"]:
+                transaction["creator"] = _ref_id(attachment_data.get("Creator"))
+                transaction["created"] = attachment_data.get("Created")
 
-            # Add attachment to transaction
-            transactions_map[transaction_id]["attachments"].append(attachment_data)
+            # Add attachment to transaction, with its Headers if already parsed
+            transaction["attachments"].append((attachment_data, headers))
 
         # Process each transaction to build correspondence entries
         correspondence = []
@@ -244,36 +524,24 @@ async def get_ticket_correspondence(
             }
 
             # Process each attachment in the transaction
-            for attachment_data in transaction_data["attachments"]:
-                content_type = attachment_data.get("ContentType", "")
+            for attachment_data, headers in transaction_data["attachments"]:
+                if headers is None:
+                    headers = _parse_headers(attachment_data.get("Headers") or "")
+                content_type, is_inline_text = classify_attachment(attachment_data, headers)
                 subject = attachment_data.get("Subject", "").strip()
 
                 # Skip multipart/mixed containers
                 if content_type == "multipart/mixed":
                     continue
 
-                # Check if it's a text type
-                is_text = content_type.startswith("text/")
-                if not is_text and content_type == "application/octet-stream":
-                    # Check for X-RT-Original-Content-Type
-                    headers_str = attachment_data.get("Headers", "")
-                    for line in headers_str.split('\n'):
-                        if line.startswith("X-RT-Original-Content-Type:"):
-                            original_type = line.split(":", 1)[1].strip()
-                            if original_type.startswith("text/"):
-                                is_text = True
-                                content_type = original_type
-                            break
-
-                # Determine if this is inline text or a file attachment
-                is_inline_text = is_text and (not subject or subject == "")
-
                 if is_inline_text:
                     # This is user-typed text content
                     encoded_content = attachment_data.get("Content", "")
                     try:
                         if encoded_content:
-                            entry["message"] = base64.b64decode(encoded_content).decode("utf-8")
+                            # a2b_base64 accepts the ASCII str directly, skipping the
+                            # extra encode pass base64.b64decode does first
+                            entry["message"] = binascii.a2b_base64(encoded_content).decode("utf-8")
                         else:
                             entry["message"] = ""
                     except Exception as decode_error:
@@ -281,16 +549,7 @@ async def get_ticket_correspondence(
 
                 else:
                     # This is a file attachment
-                    encoded_content = attachment_data.get("Content", "")
-                    file_size = len(encoded_content) if encoded_content else 0
-
-                    # Convert size to human-readable format
-                    if file_size < 1024:
-                        size_str = f"{file_size} bytes"
-                    elif file_size < 1024 * 1024:
-                        size_str = f"{file_size / 1024:.1f} KB"
-                    else:
-                        size_str = f"{file_size / (1024 * 1024):.1f} MB"
+                    size_str = _format_size(attachment_size(attachment_data, headers) or 0)
 
                     entry["attachments"].append({
                         "id": attachment_data.get("id"),
@@ -306,28 +565,28 @@ async def get_ticket_correspondence(
 
         await ctx.info(f"Successfully retrieved {len(correspondence)} correspondence entries")
 
-        return {
+        return _json_result({
             "ticket_id": ticket_id,
             "total_attachments": total_attachments,
             "correspondence_count": len(correspondence),
             "correspondence": correspondence
-        }
+        })
 
     except httpx.HTTPStatusError as e:
         error_msg = f"HTTP error {e.response.status_code}: {e.response.text}"
         await ctx.error(error_msg)
-        return {"error": error_msg, "ticket_id": ticket_id}
+        return _json_result({"error": error_msg, "ticket_id": ticket_id})
     except Exception as e:
         error_msg = f"Failed to fetch correspondence: {str(e)}"
         await ctx.error(error_msg)
-        return {"error": error_msg, "ticket_id": ticket_id}
+        return _json_result({"error": error_msg, "ticket_id": ticket_id})
 
 
-@mcp.tool
+@mcp.tool(output_schema=JSON_OBJECT_SCHEMA)
 async def get_attachment(
     attachment_id: int,
     ctx: Context
-) -> dict:
+) -> ToolResult:
     """
     Download a specific attachment by ID.
 
@@ -367,23 +626,14 @@ async def get_attachment(
         encoded_content = attachment_data.get("Content", "")
 
         # Calculate size
-        file_size = len(encoded_content) if encoded_content else 0
-        if file_size < 1024:
-            size_str = f"{file_size} bytes"
-        elif file_size < 1024 * 1024:
-            size_str = f"{file_size / 1024:.1f} KB"
-        else:
-            size_str = f"{file_size / (1024 * 1024):.1f} MB"
+        size_str = _format_size(attachment_size(attachment_data) or 0)
 
         # Extract creator
-        creator_obj = attachment_data.get("Creator")
-        creator_id = None
-        if creator_obj:
-            creator_id = creator_obj.get("id") if isinstance(creator_obj, dict) else creator_obj
+        creator_id = _ref_id(attachment_data.get("Creator"))
 
         await ctx.info(f"Successfully fetched attachment {attachment_id} ({size_str})")
 
-        return {
+        return _json_result({
             "attachment_id": attachment_id,
             "filename": subject or "untitled",
             "content_type": content_type,
@@ -391,16 +641,16 @@ async def get_attachment(
             "content_base64": encoded_content,
             "created": attachment_data.get("Created"),
             "creator": creator_id
-        }
+        })
 
     except httpx.HTTPStatusError as e:
         error_msg = f"HTTP error {e.response.status_code}: {e.response.text}"
         await ctx.error(error_msg)
-        return {"error": error_msg, "attachment_id": attachment_id}
+        return _json_result({"error": error_msg, "attachment_id": attachment_id})
     except Exception as e:
         error_msg = f"Failed to fetch attachment: {str(e)}"
         await ctx.error(error_msg)
-        return {"error": error_msg, "attachment_id": attachment_id}
+        return _json_result({"error": error_msg, "attachment_id": attachment_id})
 
 
 @mcp.tool
@@ -441,7 +691,6 @@ async def search_tickets(
         await ctx.info(f"Searching tickets with query: '{query}' (limit={limit})")
 
         # URL encode the query
-        from urllib.parse import quote
         encoded_query = quote(query)
 
         # Make request to simple search endpoint with fields parameter to get ticket details
@@ -466,30 +715,16 @@ async def search_tickets(
         # Process each ticket to extract summary info
         tickets = []
         for item in items:
-            ticket_summary = {
-                "id": item.get("id"),
-                "subject": item.get("Subject"),
-                "status": item.get("Status"),
-            }
-
-            # Extract Queue (might be object or string)
-            queue = item.get("Queue")
-            if isinstance(queue, dict):
-                ticket_summary["queue"] = queue.get("id") or queue.get("Name")
-            else:
-                ticket_summary["queue"] = queue
-
-            # Extract Owner (might be object or string)
-            owner = item.get("Owner")
-            if isinstance(owner, dict):
-                ticket_summary["owner"] = owner.get("id") or owner.get("Name")
-            else:
-                ticket_summary["owner"] = owner
-
-            # Extract Created timestamp
-            ticket_summary["created"] = item.get("Created")
-
-            tickets.append(ticket_summary)
+            get = item.get
+            tickets.append({
+                "id": get("id"),
+                "subject": get("Subject"),
+                "status": get("Status"),
+                # Queue and Owner might be objects or strings
+                "queue": _ref_id(get("Queue")),
+                "owner": _ref_id(get("Owner")),
+                "created": get("Created")
+            })
 
         await ctx.info(f"Successfully processed {len(tickets)} ticket summaries")
 
@@ -540,82 +775,144 @@ async def get_ticket_hierarchy(
 
         # Track visited tickets to avoid cycles
         visited = set()
-        ticket_details = {}
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+        # Flat ticket table: rows addressed via id_to_idx, each row's ticket
+        # dict already in its final output shape. The nested tree is only
+        # assembled once all tickets are fetched.
+        id_to_idx: Dict[int, int] = {}
+        tickets: List[Dict[str, Any]] = []
+        parent_ids_of: List[List[int]] = []
+        child_ids_of: List[List[int]] = []
+
+        def parse_ticket(data: Dict[str, Any]) -> Tuple[Dict[str, Any], List[int], List[int]]:
+            """Split ticket data into its output dict, parent IDs and child IDs."""
+            ticket_info = {
+                "id": data.get("id"),
+                "subject": data.get("Subject"),
+                "status": data.get("Status"),
+                "owner": _ref_id(data.get("Owner")),
+                "created": data.get("Created"),
+                "time_worked": data.get("TimeWorked")
+            }
 
-        async def fetch_ticket_with_relations(tid: str) -> Optional[Dict[str, Any]]:
-            """Fetch a ticket and extract its relationships."""
-            if tid in visited:
-                return None
+            # Extract relationships
+            relationships = extract_ticket_relationships(data)
+            return ticket_info, relationships["parents"], relationships["children"]
 
-            visited.add(tid)
+        async def fetch_tickets(tids: List[int]) -> None:
+            """Fetch a batch of tickets with a single TicketSQL query into the ticket table."""
+            query = quote(" OR ".join(f"id = {tid}" for tid in tids))
+            fields = "Subject,Status,Owner,Created,TimeWorked,_hyperlinks"
+            endpoint = f"/tickets?query={query};fields={fields};per_page={len(tids)}"
 
             try:
-                data = await make_rt_request(f"/ticket/{tid}", ctx)
-
-                # Extract basic info
-                ticket_info = {
-                    "id": data.get("id"),
-                    "subject": data.get("Subject"),
-                    "status": data.get("Status"),
-                    "owner": data.get("Owner", {}).get("id") if isinstance(data.get("Owner"), dict) else data.get("Owner"),
-                    "created": data.get("Created"),
-                    "time_worked": data.get("TimeWorked")
-                }
-
-                # Extract relationships
-                relationships = extract_ticket_relationships(data)
-                ticket_info["parent_ids"] = relationships["parents"]
-                ticket_info["child_ids"] = relationships["children"]
-
-                ticket_details[tid] = ticket_info
-                return ticket_info
+                async with semaphore:
+                    data = await make_rt_request(endpoint, ctx)
+            except Exception as e:
+                await ctx.error(f"Failed to fetch tickets {', '.join(map(str, tids))}: {str(e)}")
+                return
+
+            for item in data.get("items", []):
+                await add_ticket(item)
 
+            # TicketSQL leaves out merged and deleted tickets; fetch those one by one
+            await asyncio.gather(*(
+                fetch_ticket(tid) for tid in tids if tid not in id_to_idx
+            ))
+
+        async def fetch_ticket(tid: int) -> None:
+            """Fetch a single ticket missing from the batch results into the ticket table."""
+            try:
+                async with semaphore:
+                    data = await make_rt_request(f"/ticket/{tid}", ctx)
             except Exception as e:
                 await ctx.error(f"Failed to fetch ticket {tid}: {str(e)}")
-                return None
-
-        async def build_hierarchy(tid: str, depth: int = 0) -> Optional[Dict[str, Any]]:
-            """Recursively build the hierarchy tree."""
-            ticket_info = await fetch_ticket_with_relations(tid)
-            if not ticket_info:
-                return None
-
-            result = {
-                "id": ticket_info["id"],
-                "subject": ticket_info["subject"],
-                "status": ticket_info["status"],
-                "owner": ticket_info["owner"],
-                "created": ticket_info["created"],
-                "time_worked": ticket_info["time_worked"]
-            }
+                return
+
+            await add_ticket(data, tid)
+
+        async def add_ticket(data: Dict[str, Any], requested_id: Optional[int] = None) -> None:
+            """Add ticket data as a row of the ticket table, once per ticket."""
+            try:
+                ticket_info, parent_ids, child_ids = parse_ticket(data)
+                tid = int(ticket_info["id"])
+            except Exception as e:
+                await ctx.error(f"Failed to parse ticket {data.get('id')}: {str(e)}")
+                return
+
+            if tid not in id_to_idx:
+                visited.add(tid)
+                id_to_idx[tid] = len(tickets)
+                tickets.append(ticket_info)
+                parent_ids_of.append(parent_ids)
+                child_ids_of.append(child_ids)
+
+            # A merged ticket resolves to the ticket it was merged into
+            if requested_id is not None:
+                id_to_idx[requested_id] = id_to_idx[tid]
+
+        # Breadth-first traversal: each level is fetched with as few
+        # requests as possible, batches of a level run concurrently
+        root_id = ticket_id
+        frontier = [root_id]
+        visited.add(root_id)
+
+        while frontier:
+            level_start = len(tickets)
+            await asyncio.gather(*(
+                fetch_tickets(frontier[i:i + TICKET_BATCH_SIZE])
+                for i in range(0, len(frontier), TICKET_BATCH_SIZE)
+            ))
+
+            if not recursive:
+                break
+
+            # Collect unvisited relatives of this level (visited avoids cycles)
+            frontier = []
+            for idx in range(level_start, len(tickets)):
+                for related_id in child_ids_of[idx] + parent_ids_of[idx]:
+                    if related_id not in visited:
+                        visited.add(related_id)
+                        frontier.append(related_id)
+
+        emitted = set()
+
+        def build_hierarchy(idx: int) -> Dict[str, Any]:
+            """Build the nested hierarchy tree below a ticket row."""
+            # Each row is emitted once, so its dict can be reused as the tree node
+            result = tickets[idx]
 
             if recursive:
-                # Fetch children recursively
-                if ticket_info["child_ids"]:
-                    result["children"] = {}
-                    for child_id in ticket_info["child_ids"]:
-                        child_tree = await build_hierarchy(child_id, depth + 1)
-                        if child_tree:
-                            result["children"][child_id] = child_tree
-
-                # Fetch parents recursively
-                if ticket_info["parent_ids"]:
-                    result["parents"] = {}
-                    for parent_id in ticket_info["parent_ids"]:
-                        parent_tree = await build_hierarchy(parent_id, depth + 1)
-                        if parent_tree:
-                            result["parents"][parent_id] = parent_tree
+                # Walk each ticket's own hyperlinks in order, children before
+                # parents; each ticket appears once, under its first relative
+                for key, related_ids in (
+                    ("children", child_ids_of[idx]),
+                    ("parents", parent_ids_of[idx])
+                ):
+                    if not related_ids:
+                        continue
+                    result[key] = {}
+                    for related_id in related_ids:
+                        related_idx = id_to_idx.get(related_id)
+                        if related_idx is not None and related_idx not in emitted:
+                            emitted.add(related_idx)
+                            # JSON object keys are strings; convert only at output
+                            result[key][str(related_id)] = build_hierarchy(related_idx)
             else:
                 # Non-recursive: just include IDs
-                if ticket_info["child_ids"]:
-                    result["child_ids"] = ticket_info["child_ids"]
-                if ticket_info["parent_ids"]:
-                    result["parent_ids"] = ticket_info["parent_ids"]
+                if child_ids_of[idx]:
+                    result["child_ids"] = child_ids_of[idx]
+                if parent_ids_of[idx]:
+                    result["parent_ids"] = parent_ids_of[idx]
 
             return result
 
         # Build the hierarchy starting from the requested ticket
-        hierarchy = await build_hierarchy(str(ticket_id))
+        hierarchy = None
+        if root_id in id_to_idx:
+            emitted.add(id_to_idx[root_id])
+            hierarchy = build_hierarchy(id_to_idx[root_id])
 
         await ctx.info(f"Successfully built hierarchy for ticket {ticket_id} ({len(visited)} tickets fetched)")
 
@@ -658,7 +955,7 @@ def parse_args():
 
 def configure(args):
     """Configure global settings from command-line args and environment variables."""
-    global RT_BASE_URL, RT_TOKEN
+    global RT_BASE_URL, RT_TOKEN, _BASE_URL, _HEADERS
 
     # Priority: command-line args > environment variables
     RT_BASE_URL = args.url or os.environ.get("RT_BASE_URL") or ""
@@ -682,6 +979,13 @@ def configure(args):
         )
         sys.exit(1)
 
+    # Constant for the lifetime of the server; the shared client picks these up
+    _BASE_URL = RT_BASE_URL.rstrip('/')
+    _HEADERS = {
+        "Authorization": f"token {RT_TOKEN}",
+        "Accept": "application/json"
+    }
+
 
 if __name__ == "__main__":
     # Parse command-line arguments and configure
@@ -0,0 +1,347 @@
+"""
+Tests for the RT MCP server helpers and tools, run against a mocked RT API.
+"""
+
+import asyncio
+import base64
+import random
+import re
+from urllib.parse import unquote
+
+import pytest
+
+import rt_mcp
+
+
+class FakeContext:
+    """Minimal stand-in for the FastMCP execution context."""
+
+    def __init__(self):
+        self.errors = []
+
+    async def info(self, message):
+        pass
+
+    async def error(self, message):
+        self.errors.append(message)
+
+    async def report_progress(self, progress, total):
+        pass
+
+
+def random_link_graph(rnd: random.Random) -> dict:
+    """Build a random parent/child graph: ticket id -> {"child": [...], "parent": [...]}."""
+    size = rnd.randint(2, 12)
+    links = {tid: {"child": [], "parent": []} for tid in range(1, size + 1)}
+    for _ in range(rnd.randint(1, 3 * size)):
+        parent, child = rnd.sample(range(1, size + 1), 2)
+        if child not in links[parent]["child"]:
+            links[parent]["child"].append(child)
+            links[child]["parent"].append(parent)
+
+    # Each ticket lists its hyperlinks in its own (arbitrary) order
+    for relations in links.values():
+        rnd.shuffle(relations["child"])
+        rnd.shuffle(relations["parent"])
+    return links
+
+
+def ticket_data(tid: int, links: dict) -> dict:
+    """RT ticket data as returned by /ticket/{id} or a /tickets search."""
+    return {
+        "id": tid,
+        "Subject": f"Ticket {tid}",
+        "Status": "open",
+        "Owner": {"id": "owner", "type": "user"},
+        "Created": "2024-01-01T00:00:00Z",
+        "TimeWorked": 0,
+        "_hyperlinks": [
+            {"ref": ref, "type": "ticket", "id": str(related_id)}
+            for ref in ("child", "parent")
+            for related_id in links[tid][ref]
+        ]
+    }
+
+
+def reference_hierarchy(links: dict, root: int) -> dict:
+    """Tree built by the original sequential, depth-first /ticket/{id} traversal."""
+    visited = set()
+
+    def build(tid):
+        if tid in visited:
+            return None
+        visited.add(tid)
+
+        node = {
+            "id": tid,
+            "subject": f"Ticket {tid}",
+            "status": "open",
+            "owner": "owner",
+            "created": "2024-01-01T00:00:00Z",
+            "time_worked": 0
+        }
+        for key, ref in (("children", "child"), ("parents", "parent")):
+            if links[tid][ref]:
+                node[key] = {}
+                for related_id in links[tid][ref]:
+                    subtree = build(related_id)
+                    if subtree:
+                        node[key][str(related_id)] = subtree
+        return node
+
+    return build(root)
+
+
+def mock_rt(monkeypatch, links: dict, rnd: random.Random, searchable=None, merged=None) -> list:
+    """
+    Serve ticket endpoints from a link graph with random latency and result order.
+
+    Tickets not in searchable (default: all) are left out of /tickets search
+    results, as RT does for merged and deleted tickets. merged maps ticket IDs
+    to the ticket /ticket/{id} resolves them to.
+    """
+    requests = []
+    searchable = set(links) if searchable is None else searchable
+    merged = merged or {}
+
+    async def fake_request(endpoint, ctx=None):
+        requests.append(endpoint)
+        await asyncio.sleep(rnd.random() * 0.002)
+
+        if endpoint.startswith("/tickets?"):
+            ids = [int(tid) for tid in re.findall(r"id = (\d+)", unquote(endpoint))]
+            items = [ticket_data(tid, links) for tid in ids if tid in searchable]
+            rnd.shuffle(items)
+            return {"items": items}
+
+        tid = int(endpoint.rsplit("/", 1)[1])
+        return ticket_data(merged.get(tid, tid), links)
+
+    monkeypatch.setattr(rt_mcp, "make_rt_request", fake_request)
+    return requests
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("seed", range(200))
+async def test_hierarchy_matches_sequential_traversal(monkeypatch, seed):
+    rnd = random.Random(seed)
+    links = random_link_graph(rnd)
+    root = rnd.choice(list(links))
+    mock_rt(monkeypatch, links, rnd)
+
+    result = await rt_mcp.get_ticket_hierarchy(root, True, FakeContext())
+
+    assert result["hierarchy"] == reference_hierarchy(links, root)
+    assert result["tickets_fetched"] == len(_tree_ids(result["hierarchy"]))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("seed", range(50))
+async def test_hierarchy_includes_tickets_missing_from_search(monkeypatch, seed):
+    rnd = random.Random(seed)
+    links = random_link_graph(rnd)
+    root = rnd.choice(list(links))
+    searchable = set(rnd.sample(list(links), rnd.randint(0, len(links) - 1)))
+    mock_rt(monkeypatch, links, rnd, searchable=searchable)
+
+    result = await rt_mcp.get_ticket_hierarchy(root, True, FakeContext())
+
+    assert result["hierarchy"] == reference_hierarchy(links, root)
+
+
+@pytest.mark.asyncio
+async def test_hierarchy_resolves_merged_tickets(monkeypatch):
+    # Ticket 5 was merged into 2; 1 links to both its old and new ID
+    links = {
+        1: {"child": [5, 2, 3], "parent": []},
+        2: {"child": [4], "parent": [1]},
+        3: {"child": [], "parent": [1]},
+        4: {"child": [], "parent": [2]}
+    }
+    mock_rt(monkeypatch, links, random.Random(0), searchable={1, 2, 3, 4}, merged={5: 2})
+
+    result = await rt_mcp.get_ticket_hierarchy(1, True, FakeContext())
+
+    children = result["hierarchy"]["children"]
+    assert list(children) == ["5", "3"]
+    assert children["5"]["id"] == 2
+    assert list(children["5"]["children"]) == ["4"]
+
+
+@pytest.mark.asyncio
+async def test_hierarchy_of_merged_root(monkeypatch):
+    links = {
+        2: {"child": [4], "parent": []},
+        4: {"child": [], "parent": [2]}
+    }
+    mock_rt(monkeypatch, links, random.Random(0), searchable={2, 4}, merged={7: 2})
+
+    result = await rt_mcp.get_ticket_hierarchy(7, True, FakeContext())
+
+    assert result["hierarchy"]["id"] == 2
+    assert list(result["hierarchy"]["children"]) == ["4"]
+
+def _tree_ids(node: dict) -> set:
+    """Collect all ticket IDs in an emitted hierarchy tree."""
+    ids = {node["id"]}
+    for key in ("children", "parents"):
+        for subtree in node.get(key, {}).values():
+            ids |= _tree_ids(subtree)
+    return ids
+
+
+@pytest.mark.asyncio
+async def test_hierarchy_non_recursive_lists_ids(monkeypatch):
+    links = {
+        1: {"child": [3, 2], "parent": [4]},
+        2: {"child": [], "parent": [1]},
+        3: {"child": [], "parent": [1]},
+        4: {"child": [1], "parent": []}
+    }
+    requests = mock_rt(monkeypatch, links, random.Random(0))
+
+    result = await rt_mcp.get_ticket_hierarchy(1, False, FakeContext())
+
+    assert len(requests) == 1
+    assert result["hierarchy"]["child_ids"] == [3, 2]
+    assert result["hierarchy"]["parent_ids"] == [4]
+    assert "children" not in result["hierarchy"]
+
+
+def _wrap_crlf(encoded: str, width: int = 76) -> str:
+    """Wrap base64 text into CRLF-terminated lines, as MIME encoders do."""
+    return "".join(encoded[i:i + width] + "\r\n" for i in range(0, len(encoded), width))
+
+
+@pytest.mark.parametrize("size", [0, 1, 2, 3, 4, 57, 100, 3000, 3001, 12345])
+@pytest.mark.parametrize("encode", [
+    lambda data: base64.b64encode(data).decode(),
+    lambda data: base64.encodebytes(data).decode(),
+    lambda data: _wrap_crlf(base64.b64encode(data).decode()),
+], ids=["unwrapped", "lf", "crlf"])
+def test_attachment_size_from_base64(size, encode):
+    content = encode(bytes(range(256)) * (size // 256) + bytes(size % 256))
+
+    assert rt_mcp.attachment_size({"Content": content, "Headers": ""}) == size
+
+
+def test_attachment_size_prefers_content_length():
+    attachment = {
+        "Content": base64.b64encode(b"abc").decode(),
+        "Headers": "Content-Type: application/pdf\nContent-Length: 4096\n"
+    }
+
+    assert rt_mcp.attachment_size(attachment) == 4096
+
+
+def test_attachment_size_unknown_without_content():
+    assert rt_mcp.attachment_size({"Headers": "Content-Type: application/pdf\n"}) is None
+
+
+def test_parse_headers_crlf():
+    headers = rt_mcp._parse_headers(
+        "Content-Type: text/plain; charset=utf-8\r\n"
+        "Content-Length:  42 \r\n"
+        "X-Empty:\r\n"
+    )
+
+    assert headers == {
+        "content-type": "text/plain; charset=utf-8",
+        "content-length": "42",
+        "x-empty": ""
+    }
+
+
+def test_parse_headers_folded():
+    headers = rt_mcp._parse_headers(
+        "Content-Disposition: attachment;\n"
+        "\tfilename=\"report.pdf\"\n"
+        " X-Not-A-Header: value\n"
+        "Content-Type: application/pdf\n"
+    )
+
+    # Continuation lines are not mistaken for headers of their own
+    assert headers == {
+        "content-disposition": "attachment;",
+        "content-type": "application/pdf"
+    }
+
+
+def test_parse_headers_first_occurrence_wins():
+    headers = rt_mcp._parse_headers(
+        "X-RT-Original-Content-Type: text/html\n"
+        "x-rt-original-content-type: application/pdf\n"
+    )
+
+    assert headers == {"x-rt-original-content-type": "text/html"}
+
+
+@pytest.mark.asyncio
+async def test_correspondence_cancels_fetches_after_failure(monkeypatch):
+    cancelled = []
+
+    async def fake_request(endpoint, ctx=None):
+        if "/attachments?" in endpoint:
+            return {"items": [
+                {
+                    "id": aid,
+                    "Subject": "",
+                    "ContentType": "text/plain",
+                    "TransactionId": {"id": aid, "type": "transaction"},
+                    "Headers": ""
+                }
+                for aid in range(1, 6)
+            ]}
+
+        if endpoint == "/attachment/1":
+            raise RuntimeError("connection reset")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(endpoint)
+            raise
+
+    monkeypatch.setattr(rt_mcp, "make_rt_request", fake_request)
+    ctx = FakeContext()
+
+    result = await asyncio.wait_for(rt_mcp.get_ticket_correspondence(1, ctx), 5)
+
+    assert "connection reset" in result.structured_content["error"]
+    assert sorted(cancelled) == [f"/attachment/{aid}" for aid in range(2, 6)]
+
+
+@pytest.mark.asyncio
+async def test_correspondence_parses_list_headers_once(monkeypatch):
+    requests = []
+    parsed = []
+    parse_headers = rt_mcp._parse_headers
+
+    def counting_parse_headers(headers_str):
+        parsed.append(headers_str)
+        return parse_headers(headers_str)
+
+    async def fake_request(endpoint, ctx=None):
+        requests.append(endpoint)
+        return {"items": [
+            {
+                "id": aid,
+                "Subject": f"file{aid}.pdf",
+                "ContentType": "application/pdf",
+                "TransactionId": {"id": 10, "type": "transaction"},
+                "Creator": {"id": "alice", "type": "user"},
+                "Created": "2024-01-01T00:00:00Z",
+                "Headers": f"Content-Type: application/pdf\nContent-Length: {aid * 1024}\n"
+            }
+            for aid in range(1, 4)
+        ]}
+
+    monkeypatch.setattr(rt_mcp, "_parse_headers", counting_parse_headers)
+    monkeypatch.setattr(rt_mcp, "make_rt_request", fake_request)
+
+    result = await rt_mcp.get_ticket_correspondence(1, FakeContext())
+
+    assert len(requests) == 1
+    assert len(parsed) == 3
+    (entry,) = result.structured_content["correspondence"]
+    assert entry["creator"] == "alice"
+    assert [a["size"] for a in entry["attachments"]] == ["1.0 KB", "2.0 KB", "3.0 KB"]